@@ -0,0 +1,404 @@
+import os
+import csv
+import json
+import hashlib
+from datetime import datetime
+from openpyxl import Workbook, load_workbook
+
+
+def split_full_name(full_name):
+    # Check if the name is likely an organization or business
+    if any(keyword in full_name.upper() for keyword in ["LLC", "INC", "CORP", "COMPANY", "INVESTMENTS", "ENTERPRISES"]):
+        # Treat the entire name as the last name (organization name)
+        return {"first_name": "", "last_name": full_name.strip()}
+    
+    # Common name prefixes and suffixes to exclude from splitting
+    prefixes = ["Dr.", "Mr.", "Ms.", "Mrs.", "Miss", "Prof."]
+    suffixes = ["Jr.", "Sr.", "II", "III", "IV", "Ph.D.", "M.D.", "Esq."]
+
+    # Clean and normalize the name
+    full_name = full_name.strip()
+
+    # Remove prefixes and suffixes using regex
+    for prefix in prefixes:
+        if full_name.startswith(prefix):
+            full_name = full_name[len(prefix):].strip()
+
+    for suffix in suffixes:
+        if full_name.endswith(suffix):
+            full_name = full_name[: -len(suffix)].strip()
+
+    # Split name into parts
+    name_parts = full_name.split()
+
+    # Handle single-word names
+    if len(name_parts) == 1:
+        return {"first_name": name_parts[0], "last_name": ""}
+
+    # Handle multi-word names (assign everything but the first part to last name)
+    first_name = name_parts[0]
+    last_name = " ".join(name_parts[1:])
+
+    return {"first_name": first_name, "last_name": last_name}
+
+def iter_owner_rows(item, split_full_name):
+    if item is None:
+        return
+    
+    # Get the list of owner names
+    owner_names = item.get('owner_names', [])
+    
+    for i in range(len(owner_names)):
+        # Ensure we process only valid owner names
+        if owner_names[i].strip():
+            full_owner_name = owner_names[i].strip()
+            print(f'Processing owner: {full_owner_name}')
+            
+            # Split the full owner name into first and last names
+            name_parts = split_full_name(owner_names[i])
+            first_name = name_parts['first_name']
+            last_name = name_parts['last_name']
+
+            # Split mailing_address into mailing_city, mailing_state, and mailing_zip
+            contact_address = item.get('contact_address', '')
+            mailing_parts = contact_address.split(" ")
+            mailing_city = mailing_parts[0] if len(mailing_parts) > 0 else ""
+            mailing_state = mailing_parts[1] if len(mailing_parts) > 1 else ""
+            mailing_zip = mailing_parts[2] if len(mailing_parts) > 2 else ""
+
+            # Yield processed data for this owner
+            yield {
+                "record_number": item.get('Record Number', ''),
+                "parcel": item.get('parcel_id', ''),
+                "first_name": first_name,
+                "last_name": last_name,
+                "full_name": owner_names[i],
+                "property_address": item.get('property_address', ''),
+                "property_city": item.get('property_city', ''),
+                "property_state": item.get('property_state', ''),
+                "property_zip_code": item.get('property_zip_code', ''),
+                "description": item.get('description', ''),
+                "mailing_address": item.get('mailing_address', ''),
+                "mailing_city": mailing_city,
+                "mailing_state": mailing_state,
+                "mailing_zip": mailing_zip,
+                "owner_name": item.get('owner_name', ''),
+                "owner_business": item.get('owner_business', ''),
+                "title": item.get('title', ''),
+                "address_1": item.get('address1', ''),
+                "address_2": item.get('address2', ''),
+                "rental_city": item.get('rental_city', ''),
+                "rental_state": item.get('rental_state', ''),
+                "rental_zipcode": item.get('zip_code', ''),
+                "phone": item.get('phone_number', ''),
+                "email": item.get('e-mail_address', ''),
+                "bedroom": item.get('bedrooms', ''),
+                "bathroom": item.get('bathrooms', ''),
+                "Tot Fin Area": item.get('Tot Fin Area', ''),
+                "year built": item.get('Year built', ''),
+                "Property Class": item.get('Property Class', ''),  # Assuming no Property Class in data
+                "Transfer Date": item.get('Transfer Date', ''),
+                "Transfer Price": item.get('Transfer Price', '')
+            }
+
+    if owner_names == []:
+        # Handle case where owner name is missing or blank
+        print(f"No valid owner name found in this entry, processing other data.")
+        # Yield data with missing owner information
+        yield {
+            "record_number": item.get('Record Number', ''),
+            "parcel": item.get('parcel_id', ''),
+            "first_name": '',
+            "last_name": '',
+            "full_name": '',
+            "property_address": item.get('property_address', ''),
+            "property_city": item.get('property_city', ''),
+            "property_state": item.get('property_state', ''),
+            "property_zip_code": item.get('property_zip_code', ''),
+            "description": item.get('description', ''),
+            "mailing_address": item.get('mailing_address', ''),
+            "mailing_city": '',
+            "mailing_state": '',
+            "mailing_zip": '',
+            "owner_name": item.get('owner_name', ''),
+            "owner_business": item.get('owner_business', ''),
+            "title": item.get('title', ''),
+            "address_1": item.get('address1', ''),
+            "address_2": item.get('address2', ''),
+            "rental_city": item.get('rental_city', ''),
+            "rental_state": item.get('rental_state', ''),
+            "rental_zipcode": item.get('zip_code', ''),
+            "phone": item.get('phone_number', ''),
+            "email": item.get('e-mail_address', ''),
+            "bedroom": item.get('bedrooms', ''),
+            "bathroom": item.get('bathrooms', ''),
+            "Tot Fin Area": item.get('Tot Fin Area', ''),
+            "year built": item.get('Year built', ''),
+            "Property Class": item.get('Property Class', ''),
+            "Transfer Date": item.get('Transfer Date', ''),
+            "Transfer Price": item.get('Transfer Price', '')
+        }
+
+
+OUTPUT_COLUMNS = [
+        "record_number", "parcel", "first_name", "last_name", "full name", "property_address",
+        "property_city", "property_state", "property_zip_code", "description",
+        "mailing_address", "mailing_city", "mailing_state", "mailing_zip",
+        "owner_name", "owner_business", "title", "address_1", "address_2",
+        "rental_city", "rental_state", "rental_zipcode", "phone", "email",
+        "bedroom", "bathroom", "Tot Fin Area", "year built", "Property Class",
+        "Transfer Date", "Transfer Price"
+]
+
+OUTPUT_KEY_COLUMNS = ["record_number", "parcel"]
+
+def clean_output_value(value):
+    # Empty cells come back as None/NaN depending on where the row was read from
+    if value is None or value != value:
+        return ''
+    return str(value)
+
+def output_row_key(row):
+    # None for rows without a record number or parcel; they cannot be matched between runs,
+    # so they are left out of the hashes and the delta
+    key = tuple(clean_output_value(row.get(column)) for column in OUTPUT_KEY_COLUMNS)
+    return key if any(key) else None
+
+def hash_output_row(row, columns):
+    serialized = json.dumps([clean_output_value(row.get(column)) for column in columns])
+    return hashlib.sha1(serialized.encode('utf-8')).hexdigest()
+
+def combine_row_hashes(row_hashes):
+    # A record with several owners produces one row per owner, so hash them together
+    digest = hashlib.sha1()
+    for row_hash in sorted(row_hashes):
+        digest.update(row_hash.encode('utf-8'))
+    return digest.hexdigest()
+
+def hash_output_rows(rows, columns):
+    row_hashes = {}
+    for row in rows:
+        key = output_row_key(row)
+        if key is not None:
+            row_hashes.setdefault(key, []).append(hash_output_row(row, columns))
+    return {key: combine_row_hashes(hashes) for key, hashes in row_hashes.items()}
+
+def iter_workbook_rows(path):
+    workbook = load_workbook(path, read_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None) or []
+        for values in rows:
+            yield dict(zip(header, values))
+    finally:
+        workbook.close()
+
+def iter_partial_rows(partial_file):
+    with open(partial_file, newline='', encoding='utf-8') as f:
+        yield from csv.DictReader(f)
+
+def write_workbook(rows, columns, path):
+    # Write-only mode streams rows to disk instead of building the whole sheet in memory
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(columns)
+    for row in rows:
+        sheet.append([row.get(column) or None for column in columns])
+    workbook.save(path)
+
+def load_output_hashes(hashes_file, columns, fallback_file=None):
+    # Returns the row hash of every key seen so far and the permit date of every record number
+    previous_hashes = {}
+    permit_dates = {}
+    if os.path.exists(hashes_file):
+        with open(hashes_file, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                key = output_row_key(row)
+                if key is not None:
+                    previous_hashes[key] = row['row_hash']
+                    if row.get('permit_date'):
+                        permit_dates[key[0]] = row['permit_date']
+    elif fallback_file and os.path.exists(fallback_file):
+        # No hash file yet (first run with delta output), so hash the previous workbook instead.
+        # The workbook has no permit dates, so its records are only removed once they are looked up again.
+        print(f"Hash file {hashes_file} not found. Hashing {fallback_file} instead.")
+        previous_hashes = hash_output_rows(iter_workbook_rows(fallback_file), columns)
+    return previous_hashes, permit_dates
+
+def save_output_hashes(hashes, permit_dates, hashes_file):
+    with open(hashes_file, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(OUTPUT_KEY_COLUMNS + ['permit_date', 'row_hash'])
+        for key, row_hash in hashes.items():
+            writer.writerow(list(key) + [permit_dates.get(key[0], ''), row_hash])
+
+def parse_permit_date(value):
+    try:
+        return datetime.strptime(value, "%m/%d/%Y")
+    except (TypeError, ValueError):
+        return None
+
+def find_removed_keys(current_hashes, previous_hashes, permit_dates, looked_up, start_date=None, end_date=None,
+                      source_record_numbers=None):
+    # A run only covers its date range (and load_enrichment_rows caps it), so a key missing from this run
+    # is only removed when this run could have seen it: its record was looked up again and resolved to
+    # other parcels, or its permit date is in the run's range but the permit is no longer in the download.
+    start = parse_permit_date(start_date)
+    end = parse_permit_date(end_date)
+    removed = []
+    for key in previous_hashes:
+        if key in current_hashes:
+            continue
+        record_number = key[0]
+        if record_number in looked_up:
+            removed.append(key)
+        elif start and end and source_record_numbers is not None and record_number not in source_record_numbers:
+            permit_date = parse_permit_date(permit_dates.get(record_number))
+            if permit_date and start <= permit_date <= end:
+                removed.append(key)
+    return removed
+
+def iter_delta_rows(rows, current_hashes, previous_hashes, removed_keys):
+    for row in rows:
+        key = output_row_key(row)
+        if key is None:
+            continue
+        if key not in previous_hashes:
+            yield {**row, 'change_type': 'new'}
+        elif previous_hashes[key] != current_hashes[key]:
+            yield {**row, 'change_type': 'changed'}
+
+    for key in removed_keys:
+        yield {**dict(zip(OUTPUT_KEY_COLUMNS, key)), 'change_type': 'removed'}
+
+def write_delta_output(rows, columns, current_hashes, previous_hashes, removed_keys, permit_dates,
+                       delta_file="Delta_output.xlsx", hashes_file="Output_hashes.csv"):
+    new = sum(1 for key in current_hashes if key not in previous_hashes)
+    changed = sum(1 for key in current_hashes if key in previous_hashes and previous_hashes[key] != current_hashes[key])
+    print(f"Delta records: {new} new, {changed} changed, {len(removed_keys)} removed")
+
+    write_workbook(iter_delta_rows(rows, current_hashes, previous_hashes, removed_keys), ['change_type'] + columns,
+                   delta_file)
+    print(f"Delta saved to {delta_file}")
+
+    # The hash file is cumulative: records outside this run keep their hashes for the next delta
+    removed = set(removed_keys)
+    hashes = {key: row_hash for key, row_hash in previous_hashes.items() if key not in removed}
+    hashes.update(current_hashes)
+    save_output_hashes(hashes, permit_dates, hashes_file)
+    print(f"Row hashes saved to {hashes_file}")
+
+
+class OutputSink:
+    # Writes every record to disk as soon as it is enriched, so memory stays bounded
+    # and a crash only loses the record that was in flight
+    def __init__(self, columns, results_file="Enrichment_results.jsonl", partial_file="Output_partial.csv"):
+        self.columns = columns
+        self.results_file = results_file
+        self.partial_file = partial_file
+        self.row_hashes = {}
+        self.permit_dates = {}
+        # Record numbers whose property lookup found a parcel this run
+        self.looked_up = set()
+        self.records_written = 0
+        self.rows_written = 0
+        # No results file when the output is rebuilt from results that were saved before
+        self._results = open(results_file, 'w', encoding='utf-8') if results_file else None
+        self._partial = open(partial_file, 'w', newline='', encoding='utf-8')
+        self._writer = csv.writer(self._partial)
+        self._writer.writerow(columns)
+
+    def write(self, case_data):
+        # Keep the raw lookup result so the output can be rebuilt without scraping again
+        if self._results:
+            self._results.write(json.dumps(case_data, default=str) + '\n')
+        if case_data is not None and case_data.get('Record Number'):
+            if case_data.get('permit_date'):
+                self.permit_dates[case_data['Record Number']] = case_data['permit_date']
+            if case_data.get('parcel_id'):
+                self.looked_up.add(case_data['Record Number'])
+        for row in iter_owner_rows(case_data, split_full_name):
+            self._writer.writerow([clean_output_value(row.get(column)) for column in self.columns])
+            key = output_row_key(row)
+            if key is not None:
+                self.row_hashes.setdefault(key, []).append(hash_output_row(row, self.columns))
+            self.rows_written += 1
+        self.records_written += 1
+        if self._results:
+            self._results.flush()
+        self._partial.flush()
+
+    def current_hashes(self):
+        return {key: combine_row_hashes(hashes) for key, hashes in self.row_hashes.items()}
+
+    def close(self):
+        if self._results:
+            self._results.close()
+        self._partial.close()
+        print(f"Wrote {self.rows_written} rows for {self.records_written} records to {self.partial_file}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def write_final_output(sink, archive_datafile=True, write_full_snapshot=True, start_date=None, end_date=None,
+                       source_record_numbers=None):
+    # start_date, end_date and source_record_numbers (the permits downloaded for that range) let the delta
+    # mark records as removed that are in this run's range but no longer in the download
+    output_file = "Output.xlsx"
+    renamed_file = 'Previous_output.xlsx'
+    delta_file = "Delta_output.xlsx"
+    hashes_file = "Output_hashes.csv"
+
+    # Hashes of the previous run, falling back to the last full workbook
+    previous_hashes, permit_dates = load_output_hashes(hashes_file, OUTPUT_COLUMNS, fallback_file=output_file)
+    previous_run_exists = os.path.exists(output_file) or os.path.exists(hashes_file)
+
+    current_hashes = sink.current_hashes()
+    removed_keys = find_removed_keys(current_hashes, previous_hashes, permit_dates, sink.looked_up,
+                                     start_date, end_date, source_record_numbers)
+    permit_dates.update(sink.permit_dates)
+    write_delta_output(iter_partial_rows(sink.partial_file), OUTPUT_COLUMNS, current_hashes, previous_hashes,
+                       removed_keys, permit_dates, delta_file, hashes_file)
+
+    if write_full_snapshot:
+        # Check if the renamed file exists
+        if os.path.exists(renamed_file):
+            # Delete the renamed file
+            os.remove(renamed_file)
+            print(f"File {renamed_file} has been deleted")
+
+        if os.path.exists(output_file):
+            # Rename the file
+            os.rename(output_file, renamed_file)
+            print(f"File renamed to {renamed_file}")
+
+    if previous_run_exists and archive_datafile:
+        if os.path.exists('ProcessedRecords.csv'):
+            os.remove('ProcessedRecords.csv')
+            print(f"File ProcessedRecords.csv has been deleted")
+        os.rename('DataFile.csv', 'ProcessedRecords.csv')
+
+    if write_full_snapshot:
+        write_workbook(iter_partial_rows(sink.partial_file), OUTPUT_COLUMNS, output_file)
+        print(f"Data saved to {output_file}")
+
+
+def reprocess_results(results_file="Enrichment_results.jsonl", write_full_snapshot=True):
+    # Rebuilds the output from the saved lookup results, e.g. after changing split_full_name
+    # or the columns, without launching Chrome
+    if not os.path.exists(results_file):
+        print(f"Results file {results_file} not found. Run the scraper first.")
+        return None
+
+    with OutputSink(OUTPUT_COLUMNS, results_file=None) as sink:
+        with open(results_file, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    sink.write(json.loads(line))
+
+    write_final_output(sink, archive_datafile=False, write_full_snapshot=write_full_snapshot)
+    return sink
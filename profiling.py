@@ -0,0 +1,136 @@
+import heapq
+import itertools
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+
+class RecordProfiler:
+    # Opt-in timeline of every wait, click, sleep and retry while a record is looked up.
+    # Only the aggregated stacks and the N slowest timelines are kept, so memory stays bounded.
+    def __init__(self):
+        self.enabled = False
+        self.top_n = 10
+        self.records_profiled = 0
+        self.folded = defaultdict(float)
+        self.dominant_steps = Counter()
+        self.slowest = []
+        self._sequence = itertools.count()
+        self._timeline = None
+        self._stack = []
+        self._record_start = None
+
+    def enable(self, top_n=10):
+        self.enabled = True
+        self.top_n = top_n
+
+    def _open(self, name):
+        entry = {
+            'name': name,
+            'path': ';'.join([item['name'] for item in self._stack] + [name]),
+            'depth': len(self._stack),
+            'start': time.perf_counter() - self._record_start,
+            'duration': 0.0,
+            'child_time': 0.0,
+            'event': False,
+        }
+        self._timeline.append(entry)
+        self._stack.append(entry)
+        return entry
+
+    def _close(self, entry):
+        entry['duration'] = time.perf_counter() - self._record_start - entry['start']
+        self._stack.pop()
+        if self._stack:
+            self._stack[-1]['child_time'] += entry['duration']
+
+    @contextmanager
+    def record(self, record_id):
+        if not self.enabled:
+            yield
+            return
+        self._timeline = []
+        self._stack = []
+        self._record_start = time.perf_counter()
+        root = self._open('record')
+        try:
+            yield
+        finally:
+            self._close(root)
+            self._finish(record_id, root)
+            self._timeline = None
+            self._stack = []
+
+    @contextmanager
+    def step(self, name):
+        if self._timeline is None:
+            yield
+            return
+        entry = self._open(name)
+        try:
+            yield
+        finally:
+            self._close(entry)
+
+    def event(self, name):
+        # Zero length marker, e.g. a retry from the retries decorator
+        if self._timeline is None:
+            return
+        entry = self._open(name)
+        entry['event'] = True
+        self._close(entry)
+
+    def sleep(self, seconds, name='sleep'):
+        with self.step(name):
+            time.sleep(seconds)
+
+    def _finish(self, record_id, root):
+        self.records_profiled += 1
+        dominant = None
+        for entry in self._timeline:
+            self_time = entry['duration'] - entry['child_time']
+            self.folded[entry['path']] += self_time
+            if dominant is None or self_time > dominant[1]:
+                dominant = (entry['name'], self_time)
+        self.dominant_steps[dominant[0]] += 1
+
+        item = (root['duration'], next(self._sequence), record_id, self._timeline)
+        if len(self.slowest) < self.top_n:
+            heapq.heappush(self.slowest, item)
+        elif self.top_n:
+            heapq.heappushpop(self.slowest, item)
+
+    def write_reports(self, prefix="profile"):
+        slowest_file = f"{prefix}_slowest.txt"
+        folded_file = f"{prefix}.folded"
+        histogram_file = f"{prefix}_histogram.txt"
+
+        with open(slowest_file, 'w', encoding='utf-8') as f:
+            for total, _, record_id, timeline in sorted(self.slowest, reverse=True):
+                # Only the retry markers, not the "retry delay" sleeps that follow them
+                retries = sum(1 for entry in timeline if entry['event'] and entry['name'].startswith('retry '))
+                f.write(f"Record {record_id}: {total:.2f}s, {retries} retries\n")
+                for entry in timeline[1:]:
+                    indent = '  ' * entry['depth']
+                    f.write(f"{entry['start']:8.2f}s {entry['duration']:7.2f}s {indent}{entry['name']}\n")
+                f.write("\n")
+
+        # One "frame;frame;frame milliseconds" line per stack, the input format of flamegraph.pl and speedscope
+        with open(folded_file, 'w', encoding='utf-8') as f:
+            for path, seconds in sorted(self.folded.items()):
+                milliseconds = round(seconds * 1000)
+                if milliseconds > 0:
+                    f.write(f"{path} {milliseconds}\n")
+
+        with open(histogram_file, 'w', encoding='utf-8') as f:
+            f.write(f"Step that took the most time, over {self.records_profiled} records\n")
+            width = max((len(name) for name in self.dominant_steps), default=0)
+            most = max(self.dominant_steps.values(), default=0)
+            for name, count in self.dominant_steps.most_common():
+                bar = '#' * max(1, round(50 * count / most))
+                f.write(f"{name.ljust(width)} {count:5d} {bar}\n")
+
+        print(f"Profile of {self.records_profiled} records saved to {slowest_file}, {folded_file} and {histogram_file}")
+
+
+profiler = RecordProfiler()
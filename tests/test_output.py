@@ -0,0 +1,78 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from output import OUTPUT_COLUMNS, OutputSink, iter_workbook_rows, load_output_hashes, write_final_output
+
+
+def record(record_number, parcel, owners, permit_date='01/05/2024', **fields):
+    return {'Record Number': record_number, 'parcel_id': parcel, 'owner_names': owners,
+            'permit_date': permit_date, **fields}
+
+
+def run(records, **kwargs):
+    # One scraper run in the current directory: DataFile.csv is archived like after a real download
+    open('DataFile.csv', 'w').close()
+    with OutputSink(OUTPUT_COLUMNS, results_file=None) as sink:
+        for case_data in records:
+            sink.write(case_data)
+    write_final_output(sink, **kwargs)
+    return [(row['change_type'], row['record_number'], row['parcel'])
+            for row in iter_workbook_rows('Delta_output.xlsx')]
+
+
+def test_new_changed_and_removed(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    assert run([record('A', '1', ['JOHN DOE']), record('B', '2', ['JANE ROE']), record('C', '3', ['MARY POE'])]) == [
+        ('new', 'A', '1'), ('new', 'B', '2'), ('new', 'C', '3')]
+
+    # B changes owner, C now resolves to another parcel
+    delta = run([record('A', '1', ['JOHN DOE']), record('B', '2', ['SAM ROE']), record('C', '4', ['MARY POE'])])
+    assert delta == [('changed', 'B', '2'), ('new', 'C', '4'), ('removed', 'C', '3')]
+
+
+def test_owner_count_change_is_one_changed_record(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    run([record('A', '1', ['JOHN DOE'])])
+
+    # Both owner rows of the record are marked, the record is not reported as new
+    assert run([record('A', '1', ['JOHN DOE', 'JANE DOE'])]) == [('changed', 'A', '1'), ('changed', 'A', '1')]
+    assert run([record('A', '1', ['JOHN DOE', 'JANE DOE'])]) == []
+
+
+def test_blank_keys_are_skipped(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    assert run([record('', '', ['JOHN DOE']), record('A', '1', ['JANE ROE'])]) == [('new', 'A', '1')]
+
+    previous_hashes, _ = load_output_hashes('Output_hashes.csv', OUTPUT_COLUMNS)
+    assert list(previous_hashes) == [('A', '1')]
+    assert run([record('', '', ['SAM DOE']), record('A', '1', ['JANE ROE'])]) == []
+
+
+def test_first_run_hashes_the_previous_workbook(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    run([record('A', '1', ['JOHN DOE']), record('B', '2', ['JANE ROE'])])
+    # Output.xlsx from before the delta output existed
+    os.remove('Output_hashes.csv')
+
+    delta = run([record('A', '1', ['JOHN DOE']), record('B', '2', ['SAM ROE'])])
+    assert delta == [('changed', 'B', '2')]
+
+
+def test_records_outside_the_run_are_not_removed(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    run([record('A', '1', ['JOHN DOE'], '01/05/2024'), record('B', '2', ['JANE ROE'], '02/05/2024')])
+
+    # A later month, and a January run that only got to look up C: A and B stay in the hash file
+    assert run([record('C', '3', ['MARY POE'], '03/05/2024')], start_date='03/01/2024', end_date='03/31/2024',
+               source_record_numbers={'C'}) == [('new', 'C', '3')]
+    assert run([record('C', '3', ['MARY POE'], '01/06/2024')], start_date='01/01/2024', end_date='01/31/2024',
+               source_record_numbers={'A', 'C'}) == []
+
+    # A is gone from January's download, so now it is removed; B still is not
+    assert run([record('C', '3', ['MARY POE'], '01/06/2024')], start_date='01/01/2024', end_date='01/31/2024',
+               source_record_numbers={'C'}) == [('removed', 'A', '1')]
+    previous_hashes, permit_dates = load_output_hashes('Output_hashes.csv', OUTPUT_COLUMNS)
+    assert sorted(previous_hashes) == [('B', '2'), ('C', '3')]
+    assert permit_dates == {'B': '02/05/2024', 'C': '01/06/2024'}
@@ -0,0 +1,155 @@
+import multiprocessing
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from work_queue import WorkQueue, RemoteQueue, WorkerFailing, run_worker, serve_queue
+
+
+def slow_handle(row):
+    time.sleep(0.05)
+    return {'n': row['n'], 'worker_pid': os.getpid()}
+
+
+def hanging_handle(row):
+    # Never finishes, so the test can kill the worker while it holds a lease
+    time.sleep(60)
+
+
+def start_worker(path, worker_id, handle):
+    run_worker(WorkQueue(path, lease_seconds=1), handle, worker_id, poll_interval=0.1)
+
+
+def wait_until(condition, timeout=30):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, "timed out"
+        time.sleep(0.05)
+
+
+def test_killed_worker_loses_no_work(tmp_path):
+    path = str(tmp_path / "work_queue.db")
+    queue = WorkQueue(path, lease_seconds=1)
+    queue.start_job()
+    assert queue.publish({'n': n} for n in range(30)) == 30
+
+    doomed = multiprocessing.Process(target=start_worker, args=(path, 'doomed', hanging_handle))
+    doomed.start()
+    wait_until(lambda: queue.counts()['leased'] == 1)
+    workers = [multiprocessing.Process(target=start_worker, args=(path, f'w{i}', slow_handle)) for i in range(2)]
+    for worker in workers:
+        worker.start()
+
+    doomed.kill()
+    doomed.join()
+
+    wait_until(queue.is_finished)
+    queue.close_job()
+    for worker in workers:
+        worker.join(timeout=30)
+        assert worker.exitcode == 0
+
+    assert queue.counts() == {'pending': 0, 'leased': 0, 'done': 30, 'failed': 0}
+    assert sorted(result['n'] for result in queue.iter_results()) == list(range(30))
+
+
+def failing_handle(row):
+    if row['n'] == 1:
+        raise RuntimeError("lookup failed")
+    return row
+
+
+def test_failing_handle_releases_the_lease(tmp_path):
+    path = str(tmp_path / "work_queue.db")
+    queue = WorkQueue(path, max_attempts=2)
+    queue.start_job()
+    queue.publish({'n': n} for n in range(3))
+
+    results = []
+    worker = threading.Thread(
+        target=lambda: results.append(run_worker(WorkQueue(path, max_attempts=2), failing_handle, 'w', 0.05))
+    )
+    worker.start()
+    wait_until(queue.is_finished)
+    queue.close_job()
+    worker.join(timeout=30)
+
+    # The worker survives the exception and the row fails after max_attempts
+    assert results == [2]
+    assert queue.counts() == {'pending': 0, 'leased': 0, 'done': 2, 'failed': 1}
+    assert list(queue.iter_failed()) == [{'n': 1}]
+
+
+def broken_handle(row):
+    # Like a worker whose Chrome died: every lookup fails
+    raise RuntimeError("chrome not reachable")
+
+
+def test_broken_worker_stops_before_using_up_the_attempts(tmp_path):
+    path = str(tmp_path / "work_queue.db")
+    queue = WorkQueue(path)
+    queue.start_job()
+    queue.publish({'n': n} for n in range(20))
+
+    errors = []
+
+    def run_broken():
+        try:
+            run_worker(WorkQueue(path), broken_handle, 'broken', 0.05, max_consecutive_failures=3)
+        except WorkerFailing as e:
+            errors.append(e)
+
+    broken = threading.Thread(target=run_broken)
+    broken.start()
+    healthy = threading.Thread(target=lambda: run_worker(WorkQueue(path), slow_handle, 'healthy', 0.05))
+    healthy.start()
+    broken.join(timeout=30)
+    wait_until(queue.is_finished)
+    queue.close_job()
+    healthy.join(timeout=30)
+
+    # The broken worker gave up after 3 failures in a row and the healthy one did every row
+    assert len(errors) == 1
+    assert queue.counts() == {'pending': 0, 'leased': 0, 'done': 20, 'failed': 0}
+
+
+def start_remote_worker(address, worker_id, handle):
+    # Only the coordinator's address, never the database path
+    run_worker(RemoteQueue(address, retry_interval=0.1), handle, worker_id, poll_interval=0.1)
+
+
+def test_remote_workers_share_the_job_over_tcp(tmp_path):
+    queue = WorkQueue(str(tmp_path / "work_queue.db"), lease_seconds=1)
+    queue.start_job()
+    server = serve_queue(queue, ('127.0.0.1', 0))
+    address = server.server_address[:2]
+    try:
+        assert queue.publish({'n': n} for n in range(30)) == 30
+
+        doomed = multiprocessing.Process(target=start_remote_worker, args=(address, 'doomed', hanging_handle))
+        doomed.start()
+        wait_until(lambda: queue.counts()['leased'] == 1)
+        workers = [multiprocessing.Process(target=start_remote_worker, args=(address, f'w{i}', slow_handle))
+                   for i in range(2)]
+        for worker in workers:
+            worker.start()
+
+        doomed.kill()
+        doomed.join()
+
+        wait_until(queue.is_finished)
+        queue.close_job()
+        for worker in workers:
+            worker.join(timeout=30)
+            assert worker.exitcode == 0
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert queue.counts() == {'pending': 0, 'leased': 0, 'done': 30, 'failed': 0}
+    results = list(queue.iter_results())
+    assert sorted(result['n'] for result in results) == list(range(30))
+    assert len({result['worker_pid'] for result in results}) == 2
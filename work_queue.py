@@ -0,0 +1,328 @@
+import json
+import os
+import socket
+import socketserver
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    status TEXT NOT NULL DEFAULT 'open',
+    created REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY,
+    job_id INTEGER NOT NULL REFERENCES jobs (id),
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT
+);
+CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, lease_expires);
+CREATE INDEX IF NOT EXISTS tasks_job ON tasks (job_id, status);
+"""
+
+
+class WorkQueue:
+    # SQLite backed queue of permit rows, owned by the coordinator. Keep the database on a local disk:
+    # SQLite locking is not reliable over NFS/SMB, so workers on other hosts go through QueueServer.
+    # Task status goes pending -> leased -> done, or failed after max_attempts expired leases.
+    # Every coordinator run is a job; workers keep waiting while a job is open and stop once it is closed.
+    def __init__(self, path="work_queue.db", lease_seconds=300, max_attempts=5, job_id=None):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.job_id = job_id
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        # One short lived connection per call, so the queue can be shared between threads and processes
+        conn = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def start_job(self):
+        # Results of earlier jobs are kept; an abandoned open job (e.g. a crashed coordinator) is closed
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("UPDATE jobs SET status = 'closed' WHERE status = 'open'")
+            self.job_id = conn.execute("INSERT INTO jobs (created) VALUES (?)", (time.time(),)).lastrowid
+            conn.execute("COMMIT")
+        return self.job_id
+
+    def close_job(self):
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET status = 'closed' WHERE id = ?", (self.job_id,))
+
+    def settings(self):
+        return {'lease_seconds': self.lease_seconds, 'max_attempts': self.max_attempts}
+
+    def latest_job(self):
+        with self._connect() as conn:
+            job = conn.execute("SELECT id, status FROM jobs ORDER BY id DESC LIMIT 1").fetchone()
+        return None if job is None else (job['id'], job['status'])
+
+    def publish(self, rows):
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            published = conn.executemany(
+                "INSERT INTO tasks (job_id, payload) VALUES (?, ?)",
+                ((self.job_id, json.dumps(row, default=str)) for row in rows)
+            ).rowcount
+            conn.execute("COMMIT")
+        return published
+
+    def _expire_leases(self, conn, now):
+        # Leases of dead workers go back to the queue, unless the row already used up its attempts
+        conn.execute(
+            "UPDATE tasks SET status = 'failed', worker = NULL "
+            "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+            (now, self.max_attempts)
+        )
+        return conn.execute(
+            "UPDATE tasks SET status = 'pending', worker = NULL "
+            "WHERE status = 'leased' AND lease_expires < ?",
+            (now,)
+        ).rowcount
+
+    def requeue_expired(self):
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            requeued = self._expire_leases(conn, time.time())
+            conn.execute("COMMIT")
+        return requeued
+
+    def lease(self, worker_id):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            self._expire_leases(conn, now)
+            task = conn.execute(
+                "SELECT id, payload FROM tasks WHERE status = 'pending' "
+                "AND job_id IN (SELECT id FROM jobs WHERE status = 'open') ORDER BY id LIMIT 1"
+            ).fetchone()
+            if task is not None:
+                conn.execute(
+                    "UPDATE tasks SET status = 'leased', worker = ?, lease_expires = ?, attempts = attempts + 1 "
+                    "WHERE id = ?",
+                    (worker_id, now + self.lease_seconds, task['id'])
+                )
+            conn.execute("COMMIT")
+        if task is None:
+            return None
+        return task['id'], json.loads(task['payload'])
+
+    def heartbeat(self, task_id, worker_id):
+        # Returns False if the lease was lost, e.g. because it expired and was taken by another worker
+        with self._connect() as conn:
+            updated = conn.execute(
+                "UPDATE tasks SET lease_expires = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+                (time.time() + self.lease_seconds, task_id, worker_id)
+            ).rowcount
+        return updated == 1
+
+    def release(self, task_id, worker_id):
+        # Hands a task back right away after the worker failed on it, instead of waiting for the lease to expire
+        with self._connect() as conn:
+            updated = conn.execute(
+                "UPDATE tasks SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "worker = NULL, lease_expires = NULL WHERE id = ? AND worker = ? AND status = 'leased'",
+                (self.max_attempts, task_id, worker_id)
+            ).rowcount
+        return updated == 1
+
+    def complete(self, task_id, worker_id, result):
+        with self._connect() as conn:
+            updated = conn.execute(
+                "UPDATE tasks SET status = 'done', result = ?, lease_expires = NULL "
+                "WHERE id = ? AND worker = ? AND status = 'leased'",
+                (json.dumps(result, default=str), task_id, worker_id)
+            ).rowcount
+        return updated == 1
+
+    def counts(self):
+        counts = {'pending': 0, 'leased': 0, 'done': 0, 'failed': 0}
+        with self._connect() as conn:
+            for row in conn.execute("SELECT status, COUNT(*) AS total FROM tasks WHERE job_id = ? GROUP BY status",
+                                    (self.job_id,)):
+                counts[row['status']] = row['total']
+        return counts
+
+    def is_finished(self):
+        counts = self.counts()
+        return counts['pending'] == 0 and counts['leased'] == 0
+
+    def iter_results(self):
+        # Results in publish order, read one row at a time
+        with self._connect() as conn:
+            for row in conn.execute("SELECT result FROM tasks WHERE job_id = ? AND status = 'done' ORDER BY id",
+                                    (self.job_id,)):
+                yield json.loads(row['result'])
+
+    def iter_failed(self):
+        with self._connect() as conn:
+            for row in conn.execute("SELECT payload FROM tasks WHERE job_id = ? AND status = 'failed' ORDER BY id",
+                                    (self.job_id,)):
+                yield json.loads(row['payload'])
+
+
+# Methods of WorkQueue that workers may call over the network
+REMOTE_METHODS = {'settings', 'latest_job', 'lease', 'heartbeat', 'release', 'complete'}
+
+
+def parse_queue_address(address):
+    host, _, port = address.rpartition(':')
+    return host or 'localhost', int(port)
+
+
+class QueueRequestHandler(socketserver.StreamRequestHandler):
+    # One JSON request line in, one JSON response line out
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline())
+            if request['method'] not in REMOTE_METHODS:
+                raise ValueError(f"Unknown method {request['method']}")
+            response = {'result': getattr(self.server.queue, request['method'])(*request.get('args', []))}
+        except Exception as e:
+            response = {'error': str(e)}
+        self.wfile.write((json.dumps(response, default=str) + '\n').encode('utf-8'))
+
+
+class QueueServer(socketserver.ThreadingTCPServer):
+    # Serves the coordinator's WorkQueue to workers on other hosts. There is no authentication,
+    # so only listen on a trusted network.
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, queue, address):
+        self.queue = queue
+        super().__init__(address, QueueRequestHandler)
+
+
+def serve_queue(queue, address):
+    server = QueueServer(queue, address)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    print(f"Serving work queue {queue.path} on {host}:{port}")
+    return server
+
+
+class RemoteQueue:
+    # Worker side of QueueServer, with the same methods run_worker uses on a WorkQueue.
+    # Calls are retried while the coordinator is unreachable, e.g. before it has started.
+    def __init__(self, address, retry_interval=5, connect_timeout=600):
+        self.address = address
+        self.retry_interval = retry_interval
+        self.connect_timeout = connect_timeout
+        settings = self._call('settings')
+        self.lease_seconds = settings['lease_seconds']
+        self.max_attempts = settings['max_attempts']
+
+    def _call(self, method, *args):
+        deadline = time.time() + self.connect_timeout
+        while True:
+            try:
+                with socket.create_connection(self.address, timeout=60) as conn:
+                    conn.sendall((json.dumps({'method': method, 'args': args}, default=str) + '\n').encode('utf-8'))
+                    response = json.loads(conn.makefile('r', encoding='utf-8').readline())
+                break
+            except (OSError, ValueError) as e:
+                if time.time() >= deadline:
+                    raise ConnectionError(f"Work queue at {self.address[0]}:{self.address[1]} is not reachable: {e}")
+                print(f"Work queue at {self.address[0]}:{self.address[1]} is not reachable ({e}). Retrying...")
+                time.sleep(self.retry_interval)
+        if 'error' in response:
+            raise RuntimeError(f"Work queue {method} failed: {response['error']}")
+        return response['result']
+
+    def latest_job(self):
+        job = self._call('latest_job')
+        return None if job is None else tuple(job)
+
+    def lease(self, worker_id):
+        task = self._call('lease', worker_id)
+        return None if task is None else tuple(task)
+
+    def heartbeat(self, task_id, worker_id):
+        return self._call('heartbeat', task_id, worker_id)
+
+    def release(self, task_id, worker_id):
+        return self._call('release', task_id, worker_id)
+
+    def complete(self, task_id, worker_id, result):
+        return self._call('complete', task_id, worker_id, result)
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def keep_lease_alive(queue, task_id, worker_id, stop_event):
+    while not stop_event.wait(queue.lease_seconds / 3):
+        if not queue.heartbeat(task_id, worker_id):
+            print(f"Worker {worker_id} lost the lease on task {task_id}")
+            return
+
+
+class WorkerFailing(Exception):
+    # Raised by run_worker when handle keeps failing, e.g. because the worker's Chrome died
+    pass
+
+
+def run_worker(queue, handle, worker_id=None, poll_interval=5, max_consecutive_failures=3):
+    # Leases rows until the job it worked on is closed. handle(payload) returns the result to commit.
+    # After each failure the worker waits a little longer before the next lease, and it gives up after
+    # max_consecutive_failures in a row, so a broken worker can't use up every row's attempts.
+    worker_id = worker_id or default_worker_id()
+    processed = 0
+    failures = 0
+    open_job = None
+    while True:
+        task = queue.lease(worker_id)
+        if task is None:
+            # A job that was already closed when the worker started belongs to an earlier run,
+            # so keep waiting for the coordinator to open the next one
+            job = queue.latest_job()
+            if job is not None and job[1] == 'open':
+                open_job = job[0]
+            elif job is not None and job[0] == open_job:
+                print(f"Worker {worker_id} finished after {processed} tasks")
+                return processed
+            time.sleep(poll_interval)
+            continue
+
+        task_id, payload = task
+        stop_event = threading.Event()
+        heartbeat = threading.Thread(target=keep_lease_alive, args=(queue, task_id, worker_id, stop_event),
+                                     daemon=True)
+        heartbeat.start()
+        try:
+            result = handle(payload)
+        except Exception as e:
+            print(f"Worker {worker_id} failed on task {task_id}: {e}")
+            queue.release(task_id, worker_id)
+            failures += 1
+            if failures >= max_consecutive_failures:
+                raise WorkerFailing(f"Worker {worker_id} failed on {failures} tasks in a row") from e
+            time.sleep(poll_interval * failures)
+            continue
+        finally:
+            stop_event.set()
+            heartbeat.join()
+
+        failures = 0
+        if queue.complete(task_id, worker_id, result):
+            processed += 1
+        else:
+            print(f"Worker {worker_id} could not commit task {task_id}, the lease was taken over")